@@ -1 +1 @@
-from .app import app  # noqa: F401
+from .app import create_app  # noqa: F401
@@ -1,11 +1,84 @@
-from datetime import datetime
+import atexit
+import calendar
+import gc
+import os
+from datetime import date, datetime, timedelta
 
-from flask import Flask, render_template, request, redirect, url_for
+import click
+from flask import Flask, abort, jsonify, render_template, request, redirect, url_for
 
-from goodreads_visualizer import orchestrator, goodreads_api, url_utils
+from goodreads_visualizer import (
+    orchestrator,
+    goodreads_api,
+    population,
+    shelf_cache,
+    url_utils,
+)
 
 
-app = Flask(__name__)
+# Longest `last_days` range and rolling window accepted, in days.
+MAX_RANGE_DAYS = 100 * 366
+MAX_WINDOW_DAYS = 5 * 366
+
+
+def create_app() -> Flask:
+    goodreads_api.load_env()
+
+    app = Flask(__name__)
+    app.config.from_mapping(
+        SHELF_CACHE_TTL_SECONDS=int(
+            os.getenv("SHELF_CACHE_TTL_SECONDS", shelf_cache.DEFAULT_TTL_SECONDS)
+        ),
+        SHELF_CACHE_SIZE=int(
+            os.getenv("SHELF_CACHE_SIZE", shelf_cache.DEFAULT_MAX_SIZE)
+        ),
+        SHELF_SNAPSHOT_PATH=os.getenv("SHELF_SNAPSHOT_PATH"),
+        SHELF_SNAPSHOT_SIZE=int(
+            os.getenv("SHELF_SNAPSHOT_SIZE", shelf_cache.DEFAULT_SNAPSHOT_SIZE)
+        ),
+        POPULATION_STATS_DIR=os.getenv("POPULATION_STATS_DIR"),
+    )
+
+    shelf_cache.configure(
+        ttl_seconds=app.config["SHELF_CACHE_TTL_SECONDS"],
+        max_size=app.config["SHELF_CACHE_SIZE"],
+    )
+    snapshot_path = app.config["SHELF_SNAPSHOT_PATH"]
+    if snapshot_path:
+        shelf_cache.load_snapshot(snapshot_path)
+        atexit.register(
+            shelf_cache.dump_snapshot,
+            snapshot_path,
+            app.config["SHELF_SNAPSHOT_SIZE"],
+        )
+
+    population_dir = app.config["POPULATION_STATS_DIR"]
+    population.configure(directory=population_dir)
+    if population_dir:
+        population.load(population_dir)
+
+    app.add_url_rule("/", view_func=index, methods=["GET", "POST"])
+    app.add_url_rule("/load_data", view_func=load_data_for_url, methods=["POST"])
+    app.add_url_rule(
+        "/users/<user_id>", view_func=reading_data, methods=["GET", "POST"]
+    )
+    app.add_url_rule("/users/<user_id>/range", view_func=reading_range_data)
+    app.cli.add_command(export_shelves_command)
+
+    # The package imports these lazily so `import goodreads_visualizer` stays
+    # cheap, but a serving process needs them anyway. Loading them here puts
+    # them in the master under `gunicorn --preload` instead of in every
+    # worker on its first request.
+    import numpy  # noqa: F401
+    import requests  # noqa: F401
+
+    # Under `gunicorn --preload` everything allocated so far (including the
+    # snapshot shelves and the modules above) lives in the master. Freezing it
+    # keeps the collector from touching those objects, so forked workers keep
+    # sharing the pages.
+    gc.freeze()
+
+    return app
 
 
 def get_year_param(args):
@@ -17,7 +90,52 @@ def get_year_param(args):
     return year
 
 
-@app.route("/", methods=["GET", "POST"])
+def get_date_range_params(args):
+    """Parse `last_days`, or `start`/`end`, into an inclusive date range.
+
+    `start` and `end` take `YYYY-MM-DD` or `YYYY-MM`; a month covers the whole
+    month, so `start=2022-06&end=2023-03` is June 2022 through March 2023.
+    A missing `start` is returned as None, meaning "from the first book read".
+    Returns None when no range was asked for and aborts with a 400 when the
+    parameters don't parse.
+    """
+    last_days = args.get("last_days")
+    start = args.get("start")
+    end = args.get("end")
+
+    try:
+        if last_days:
+            num_days = int(last_days)
+            if num_days < 1 or num_days > MAX_RANGE_DAYS:
+                abort(400)
+            today = date.today()
+            return today - timedelta(days=num_days - 1), today
+
+        if not start and not end:
+            return None
+
+        start_date = _parse_date_param(start, end_of_month=False) if start else None
+        end_date = _parse_date_param(end, end_of_month=True) if end else date.today()
+    except (ValueError, OverflowError):
+        abort(400)
+
+    if start_date is not None and start_date > end_date:
+        abort(400)
+
+    return start_date, end_date
+
+
+def _parse_date_param(value, end_of_month):
+    if len(value) == len("YYYY-MM"):
+        month = datetime.strptime(value, "%Y-%m").date()
+        if not end_of_month:
+            return month
+        _, last_day = calendar.monthrange(month.year, month.month)
+        return month.replace(day=last_day)
+
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
 def index():
     if request.method == "POST":
         url = request.form["goodreads_url"]
@@ -28,14 +146,12 @@ def index():
     return render_template("index.html")
 
 
-@app.route("/load_data", methods=["POST"])
 def load_data_for_url():
     url = request.form["goodreads_url"]
     user_id = url_utils.parse_user_id(url)
     return redirect(url_for("reading_data", user_id=user_id))
 
 
-@app.route("/users/<user_id>", methods=["GET", "POST"])
 def reading_data(user_id):
     year = request.args.get("year") or request.form.get("year")
     if year == "" or year is None:
@@ -43,6 +159,8 @@ def reading_data(user_id):
     else:
         year = int(str(year))
 
+    date_range = get_date_range_params(request.args)
+
     books = goodreads_api.fetch_books_data(user_id)
     all_read_books = []
     years = set()
@@ -53,8 +171,22 @@ def reading_data(user_id):
 
     years = [str(x) for x in sorted(years, reverse=True)]
 
-    data = orchestrator.get_user_books_data(books, year)
-    graphs_data = orchestrator.graphs_data_for_year(all_read_books, year)
+    range_stats = None
+    if date_range is not None:
+        index = shelf_cache.reading_index(user_id, books)
+        start, end = date_range
+        start = start or index.first_day or end
+        data = orchestrator.get_user_books_data_for_range(index, start, end)
+        graphs_data = orchestrator.graphs_data_for_year(index.books_between(start, end))
+        range_stats = orchestrator.get_range_stats(index, start, end)
+        year = None
+    else:
+        data = orchestrator.get_user_books_data(books, year)
+        graphs_data = orchestrator.graphs_data_for_year(all_read_books, year)
+
+    percentiles = {}
+    if year is not None:
+        percentiles = population.percentiles(year, books)
 
     return render_template(
         "users/index.html",
@@ -63,7 +195,71 @@ def reading_data(user_id):
         data=data,
         graphs_data=graphs_data.serialize(),
         selected_year=str(year),
+        range_stats=range_stats,
+        percentiles=percentiles,
+    )
+
+
+def reading_range_data(user_id):
+    books = goodreads_api.fetch_books_data(user_id)
+    index = shelf_cache.reading_index(user_id, books)
+
+    date_range = get_date_range_params(request.args)
+    if date_range is None:
+        if index.first_day is None or index.last_day is None:
+            return jsonify({"stats": None, "rolling_pages_per_day": None})
+        date_range = (index.first_day, index.last_day)
+
+    try:
+        window_days = int(request.args.get("window", 30))
+    except ValueError:
+        abort(400)
+    if window_days < 1 or window_days > MAX_WINDOW_DAYS:
+        abort(400)
+
+    start, end = date_range
+    start = start or index.first_day or end
+
+    stats = orchestrator.get_range_stats(index, start, end)
+
+    # The series only covers days that have reading data, so its length is
+    # bounded by the shelf rather than by whatever range was asked for.
+    if index.first_day is None or index.last_day is None:
+        return jsonify({"stats": stats.serialize(), "rolling_pages_per_day": None})
+
+    try:
+        pace = orchestrator.rolling_pages_per_day_graph_data(
+            index,
+            window_days,
+            max(start, index.first_day),
+            min(end, index.last_day),
+        )
+    except OverflowError:
+        abort(400)
+
+    return jsonify(
+        {
+            "stats": stats.serialize(),
+            "rolling_pages_per_day": pace.serialize(),
+        }
     )
 
-# if __name__ == "__main__":
-#     app.run(host='0.0.0.0')
+
+@click.command("export-shelves")
+@click.argument("user_ids", nargs=-1, required=True)
+@click.option("--out", "directory", required=True, help="Directory to write to.")
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["arrow", "parquet"]),
+    default="arrow",
+    show_default=True,
+)
+def export_shelves_command(user_ids, directory, file_format):
+    """Export shelves and per-year aggregates for USER_IDS."""
+    # pyarrow is an optional extra, only needed for bulk exports.
+    from goodreads_visualizer import shelf_arrow
+
+    shelves = {user_id: goodreads_api.fetch_books_data(user_id) for user_id in user_ids}
+    shelf_arrow.export_shelves(shelves, directory, file_format)
+    click.echo(f"Exported {len(shelves)} shelves to {directory}")
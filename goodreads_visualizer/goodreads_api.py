@@ -1,22 +1,44 @@
+import logging
 import os
 from typing import List
 from datetime import datetime
 
-import requests
-from dotenv import load_dotenv
-
-from goodreads_visualizer import models
+from goodreads_visualizer import models, population, shelf_cache
 
 BASE = "https://www.goodreads.com/user/show/142394620-jordan"
 
+logger = logging.getLogger(__name__)
+
+
+def load_env() -> None:
+    # Imported here rather than at module level so importing the package stays
+    # cheap; `create_app` calls this exactly once per process.
+    from dotenv import load_dotenv
 
-if os.getenv("PYTHON_ENV") == "development":
-    load_dotenv(".env.local")
-else:
-    load_dotenv(".env.production")
+    if os.getenv("PYTHON_ENV") == "development":
+        load_dotenv(".env.local")
+    else:
+        load_dotenv(".env.production")
 
 
 def fetch_books_data(user_id: str) -> List[models.Book]:
+    cached = shelf_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    books = _fetch_books_data(user_id)
+    shelf_cache.put(user_id, books)
+    # Population stats are a nice-to-have; never fail a fetch because of them.
+    try:
+        population.fold_shelf(user_id, books)
+    except Exception:
+        logger.exception("Failed to fold shelf for %s into population stats", user_id)
+    return books
+
+
+def _fetch_books_data(user_id: str) -> List[models.Book]:
+    import requests
+
     base_url = f"https://www.goodreads.com/user/show/{user_id}"
     api_url = "https://katzenj-goodreadsapi.web.val.run"
     body = {
@@ -28,7 +50,10 @@ def fetch_books_data(user_id: str) -> List[models.Book]:
     }
     response = requests.post(api_url, json=body, headers=headers)
     json = response.json()
-    books_data = json["books"]
+    return parse_books(json["books"])
+
+
+def parse_books(books_data) -> List[models.Book]:
     books = []
     for book in books_data:
         books.append(
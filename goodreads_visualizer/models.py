@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Any, Dict, List, Optional
 
 from dataclasses import dataclass, fields
@@ -57,7 +57,7 @@ class Book:
             "title": self.title,
             "author": self.author,
             "date_read": self.date_read.isoformat() if self.date_read else None,
-            "date_added": self.date_added.isoformat(),
+            "date_added": self.date_added.isoformat() if self.date_added else None,
             "rating": self.rating,
             "num_pages": self.num_pages,
             "avg_rating": self.avg_rating,
@@ -67,6 +67,20 @@ class Book:
             "isbn": self.isbn,
         }
 
+    @classmethod
+    def deserialize(cls, data):
+        return cls(
+            title=data["title"],
+            author=data["author"],
+            date_read=_optional_datetime(data["date_read"]),
+            date_added=_optional_datetime(data["date_added"]),
+            rating=data["rating"],
+            num_pages=data["num_pages"],
+            avg_rating=data["avg_rating"],
+            date_published=_optional_datetime(data["date_published"]),
+            isbn=data["isbn"],
+        )
+
 
 @dataclass
 class BookData(DataclassBase):
@@ -102,6 +116,30 @@ class BookData(DataclassBase):
         }
 
 
+@dataclass
+class RangeStats(DataclassBase):
+    start: date
+    end: date
+    count: int
+    total_pages: int
+    average_length: Optional[float]
+    average_rating: Optional[float]
+    pages_per_day: float
+    longest_streak: int
+
+    def serialize(self):
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "count": self.count,
+            "total_pages": self.total_pages,
+            "average_length": self.average_length,
+            "average_rating": self.average_rating,
+            "pages_per_day": self.pages_per_day,
+            "longest_streak": self.longest_streak,
+        }
+
+
 @dataclass
 class Dataset(DataclassBase):
     label: str
@@ -206,3 +244,10 @@ class GraphsData(DataclassBase):
 class Dashboard:
     metrics: BookData
     graphs: GraphsData
+
+
+def _optional_datetime(value: Optional[str]) -> Optional[datetime]:
+    if value is None:
+        return None
+
+    return datetime.fromisoformat(value)
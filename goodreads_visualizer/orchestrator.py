@@ -1,10 +1,9 @@
 import calendar
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple, cast
-
-import numpy as np
+from datetime import date, datetime
+from typing import List, Optional, Sequence, cast
 
 from goodreads_visualizer import models
+from goodreads_visualizer.reading_index import ReadingIndex
 
 
 def get_user_books_data(
@@ -21,26 +20,70 @@ def get_user_books_data(
 
     ratings = [book.rating for book in read_books if book.rating is not None]
     num_pages = [book.num_pages for book in read_books if book.num_pages is not None]
-    min_rated_book = _optional_min_rated_book(read_books)
-    max_rated_book = _optional_max_rated_book(read_books)
-    longest_book = _optional_longest_book(read_books)
-    shortest_book = _optional_shortest_book(read_books)
-    average_rating = round(np.mean(ratings)) if len(ratings) > 0 else 0
-    average_length = round(np.mean(num_pages)) if len(num_pages) > 0 else 0
+    average_rating = round(sum(ratings) / len(ratings)) if len(ratings) > 0 else 0
+    average_length = round(sum(num_pages) / len(num_pages)) if len(num_pages) > 0 else 0
 
-    return models.BookData(
-        count=len(read_books),
-        total_pages=f"{sum(num_pages):,}",
-        max_rated_book=max_rated_book,
-        min_rated_book=min_rated_book,
-        max_rating=_optional_rounded_max(ratings),
-        min_rating=_optional_rounded_min(ratings),
-        average_rating=str(average_rating),
-        average_length=str(average_length),
-        max_length=_optional_rounded_max(num_pages),
-        longest_book=longest_book,
-        shortest_book=shortest_book,
-        list=sorted(read_books, key=lambda x: x.date_read, reverse=True),
+    return _book_data(read_books, sum(num_pages), average_rating, average_length)
+
+
+def get_user_books_data_for_range(
+    index: ReadingIndex, start: date, end: date
+) -> models.BookData:
+    read_books = index.books_between(start, end)
+    totals = index.totals(start, end)
+    average_rating = (
+        round(totals.rating_sum / totals.rating_count) if totals.rating_count > 0 else 0
+    )
+    average_length = (
+        round(totals.total_pages / totals.paged_count) if totals.paged_count > 0 else 0
+    )
+
+    return _book_data(read_books, totals.total_pages, average_rating, average_length)
+
+
+def get_range_stats(index: ReadingIndex, start: date, end: date) -> models.RangeStats:
+    totals = index.totals(start, end)
+    num_days = (end - start).days + 1
+
+    return models.RangeStats(
+        start=start,
+        end=end,
+        count=totals.count,
+        total_pages=totals.total_pages,
+        average_length=(
+            round(totals.total_pages / totals.paged_count, 1)
+            if totals.paged_count > 0
+            else None
+        ),
+        average_rating=(
+            round(totals.rating_sum / totals.rating_count, 1)
+            if totals.rating_count > 0
+            else None
+        ),
+        pages_per_day=round(totals.total_pages / num_days, 1) if num_days > 0 else 0,
+        longest_streak=index.longest_streak(start, end),
+    )
+
+
+def rolling_pages_per_day_graph_data(
+    index: ReadingIndex, window_days: int, start: date, end: date
+) -> models.GraphData:
+    pace = index.rolling_pages_per_day(window_days, start, end)
+
+    return models.GraphData(
+        type="line",
+        labels=[day.isoformat() for day, _ in pace],
+        x_axis_label="Date",
+        y_axis_label="Pages per day",
+        datasets=[
+            models.Dataset(
+                label=f"Pages per day ({window_days} day average)",
+                data=[round(pages, 1) for _, pages in pace],
+                background_color="#93D5BD",
+                border_width=3,
+                border_color="#93D5BD",
+            )
+        ],
     )
 
 
@@ -56,45 +99,96 @@ def graphs_data_for_year(
         elif int(book.date_read.year) == int(year):
             read_books.append(book)
 
+    previous_year_month_counts = None
     if year is not None:
-        read_books_this_year = [
-            book for book in read_books if int(book.date_read.year) == int(year)
-        ]
-        read_books_both_years = [
-            book
-            for book in read_books
-            if int(book.date_read.year) in [int(year), int(year) - 1]
-        ]
+        read_books_this_year = read_books
+        previous_year_month_counts = _month_counts(
+            [
+                book
+                for book in all_read_books
+                if book.date_read is not None
+                and int(book.date_read.year) == int(year) - 1
+            ]
+        )
     else:
         read_books_this_year = all_read_books
-        read_books_both_years = all_read_books
 
-    books_read_by_month = _books_read_by_month_graph_data(read_books_this_year)
+    return graphs_data_from_columns(
+        year=year,
+        month_counts=_month_counts(read_books_this_year),
+        previous_year_month_counts=previous_year_month_counts,
+        num_pages=[
+            book.num_pages
+            for book in read_books_this_year
+            if book.num_pages is not None
+        ],
+        rating_counts=_rating_counts(read_books_this_year),
+        published_years=[
+            book.date_published.year
+            for book in read_books_this_year
+            if book.date_published is not None
+        ],
+    )
+
+
+def graphs_data_from_columns(
+    year: Optional[int],
+    month_counts: Sequence[int],
+    previous_year_month_counts: Optional[Sequence[int]],
+    num_pages: Sequence[int],
+    rating_counts: Sequence[int],
+    published_years: Sequence[int],
+) -> models.GraphsData:
+    """Build the graphs from already aggregated columns.
 
+    `month_counts` and `previous_year_month_counts` hold 12 counts each and
+    `rating_counts` holds 5, for ratings 1 through 5. `num_pages` and
+    `published_years` are the raw values to bin. Columnar sources such as
+    `shelf_arrow` call this directly instead of building `Book` objects.
+    """
     books_read_compared_to_year = None
-    if year is not None:
+    if year is not None and previous_year_month_counts is not None:
         books_read_compared_to_year = _books_compared_to_year_graph_data(
-            read_books_both_years, int(year), int(year) - 1
+            month_counts, previous_year_month_counts, int(year), int(year) - 1
         )
 
-    book_length_distribution_data = _book_length_distribution(read_books_this_year)
-    book_rating_distribution_data = _book_rating_distribution(read_books_this_year)
-    book_publish_year_distribution_data = _book_publish_year_distribution(
-        read_books_this_year
-    )
-
     return models.GraphsData(
-        books_read=books_read_by_month,
+        books_read=_books_read_by_month_graph_data(month_counts),
         books_read_compared_to_year=books_read_compared_to_year,
-        book_length_distribution=book_length_distribution_data,
-        book_rating_distribution=book_rating_distribution_data,
-        book_publish_year_distribution=book_publish_year_distribution_data,
+        book_length_distribution=_book_length_distribution(num_pages),
+        book_rating_distribution=_book_rating_distribution(rating_counts),
+        book_publish_year_distribution=_book_publish_year_distribution(published_years),
     )
 
 
 # PRIVATE FUNCTIONS
 
 
+def _book_data(
+    read_books: List[models.Book],
+    total_pages: int,
+    average_rating: int,
+    average_length: int,
+) -> models.BookData:
+    ratings = [book.rating for book in read_books if book.rating is not None]
+    num_pages = [book.num_pages for book in read_books if book.num_pages is not None]
+
+    return models.BookData(
+        count=len(read_books),
+        total_pages=f"{total_pages:,}",
+        max_rated_book=_optional_max_rated_book(read_books),
+        min_rated_book=_optional_min_rated_book(read_books),
+        max_rating=_optional_rounded_max(ratings),
+        min_rating=_optional_rounded_min(ratings),
+        average_rating=str(average_rating),
+        average_length=str(average_length),
+        max_length=_optional_rounded_max(num_pages),
+        longest_book=_optional_longest_book(read_books),
+        shortest_book=_optional_shortest_book(read_books),
+        list=sorted(read_books, key=lambda x: x.date_read, reverse=True),
+    )
+
+
 def _optional_rounded_max(data: List[Optional[int]]) -> Optional[int]:
     filtered = [x for x in data if x is not None]
     if len(data) == 0:
@@ -107,7 +201,11 @@ def _optional_min_rated_book(data: List[models.Book]) -> Optional[models.Book]:
     if len(data) == 0:
         return None
 
-    min_rating = min([book.rating for book in data if book.rating is not None])
+    ratings = [book.rating for book in data if book.rating is not None]
+    if len(ratings) == 0:
+        return None
+
+    min_rating = min(ratings)
     min_rated_books = cast(
         List[models.Book], [book for book in data if book.rating == min_rating]
     )
@@ -120,6 +218,8 @@ def _optional_max_rated_book(data: List[models.Book]) -> Optional[models.Book]:
     if len(data) == 0:
         return None
     filtered = [book for book in data if book.rating is not None]
+    if len(filtered) == 0:
+        return None
 
     return max(filtered, key=lambda x: (x.rating, x.date_read))
 
@@ -150,7 +250,11 @@ def _generate_distribution(data, nbins=None):
         return []
 
     if len(data) == 1:
-        return [(data[0], data[0], 1)]
+        return [(int(data[0]), int(data[0]), 1)]
+
+    # NumPy is only needed for the distribution graphs, so keep it off the
+    # import path of the package.
+    import numpy as np
 
     # Find the min and max values for the data
     min_val, max_val = min(data), max(data)
@@ -180,15 +284,30 @@ def _generate_distribution(data, nbins=None):
     return distribution
 
 
-def _books_read_by_month_graph_data(books: List[models.Book]) -> models.GraphData:
+def _month_counts(books: List[models.Book]) -> List[int]:
     counts = [0] * 12
     for book in books:
         if book.date_read is None:
             continue
 
-        idx = book.date_read.month - 1
-        counts[idx] += 1
+        counts[book.date_read.month - 1] += 1
+
+    return counts
+
+
+def _rating_counts(books: List[models.Book]) -> List[int]:
+    counts = [0] * 5
+    for book in books:
+        # Goodreads reports an unrated book as 0, which has no bucket here.
+        if book.rating is None or not 1 <= book.rating <= 5:
+            continue
+
+        counts[book.rating - 1] += 1
+
+    return counts
 
+
+def _books_read_by_month_graph_data(counts: Sequence[int]) -> models.GraphData:
     return models.GraphData(
         type="bar",
         labels=list(calendar.month_abbr[1:]),
@@ -197,7 +316,7 @@ def _books_read_by_month_graph_data(books: List[models.Book]) -> models.GraphDat
         datasets=[
             models.Dataset(
                 label="Books read",
-                data=counts,
+                data=[int(count) for count in counts],
                 background_color="#068D9D",
                 border_width=1,
             )
@@ -205,35 +324,14 @@ def _books_read_by_month_graph_data(books: List[models.Book]) -> models.GraphDat
     )
 
 
-def _books_read_compared_to_year_data(
-    read_books: List[models.Book], year: int, year_to_compare: int
-) -> Dict[Tuple[str, int], int]:
-    years_ints = [int(year), int(year_to_compare)]
-    month_year_counts = {
-        (calendar.month_abbr[month], year): 0
-        for month in range(1, 13)
-        for year in years_ints
-    }
-
-    for book in read_books:
-        if book.date_read is None:
-            continue
-        month_year_counts[
-            (calendar.month_abbr[book.date_read.month], book.date_read.year)
-        ] += 1
-
-    return month_year_counts
-
-
 def _books_compared_to_year_graph_data(
-    read_books: List[models.Book], year: int, year_to_compare: int
+    month_counts: Sequence[int],
+    month_counts_to_compare: Sequence[int],
+    year: int,
+    year_to_compare: int,
 ) -> models.GraphData:
-    data = _books_read_compared_to_year_data(read_books, year, year_to_compare)
-
-    year_one_data = [data[(month, year)] for month in calendar.month_abbr[1:]]
-    year_two_data = [
-        data[(month, year_to_compare)] for month in calendar.month_abbr[1:]
-    ]
+    year_one_data = [int(count) for count in month_counts]
+    year_two_data = [int(count) for count in month_counts_to_compare]
     return models.GraphData(
         type="line",
         labels=list(calendar.month_abbr[1:]),
@@ -256,10 +354,8 @@ def _books_compared_to_year_graph_data(
     )
 
 
-def _book_length_distribution(read_books: List[models.Book]) -> models.GraphData:
-    distribution = _generate_distribution(
-        [book.num_pages for book in read_books if book.num_pages is not None], nbins=5
-    )
+def _book_length_distribution(num_pages: Sequence[int]) -> models.GraphData:
+    distribution = _generate_distribution(num_pages, nbins=5)
     labels = [f"{x[0]}-{x[1]}" for x in distribution]
 
     return models.GraphData(
@@ -279,14 +375,7 @@ def _book_length_distribution(read_books: List[models.Book]) -> models.GraphData
     )
 
 
-def _book_rating_distribution(read_books: List[models.Book]) -> models.GraphData:
-    rating_counts = [0] * 5
-    for book in read_books:
-        if book.rating is None:
-            continue
-
-        rating_counts[book.rating - 1] += 1
-
+def _book_rating_distribution(rating_counts: Sequence[int]) -> models.GraphData:
     return models.GraphData(
         type="bar",
         labels=[str(x) for x in range(1, 6)],
@@ -295,7 +384,7 @@ def _book_rating_distribution(read_books: List[models.Book]) -> models.GraphData
         datasets=[
             models.Dataset(
                 label="Number of books",
-                data=rating_counts,
+                data=[int(count) for count in rating_counts],
                 background_color="#6D9DC5",
                 border_width=1,
             )
@@ -304,12 +393,9 @@ def _book_rating_distribution(read_books: List[models.Book]) -> models.GraphData
     )
 
 
-def _book_publish_year_distribution(read_books: List[models.Book]) -> models.GraphData:
-    published_years = [
-        book.date_published.year
-        for book in read_books
-        if book.date_published is not None
-    ]
+def _book_publish_year_distribution(
+    published_years: Sequence[int],
+) -> models.GraphData:
     distribution = _generate_distribution(published_years)
     labels = [f"{x[0]}-{x[1]}" for x in distribution]
 
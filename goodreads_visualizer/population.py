@@ -0,0 +1,280 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+from goodreads_visualizer import models
+from goodreads_visualizer.sketches import KLLSketch
+
+logger = logging.getLogger(__name__)
+
+# Below this many readers a percentile says more about who happened to use the
+# site than about readers in general.
+MIN_POPULATION = 10
+# How long a fold waits before this process's shard is written, so a burst of
+# new users costs one write and no request ever waits on the disk.
+SAVE_DELAY_SECONDS = 30
+
+COMPACTED_FILE = "population.json"
+SHARD_PATTERN = "shard-*.json"
+
+# Sketches over every reader this process knows about, used for lookups, and
+# the metrics this process folded in itself, keyed by "<user_id>:<year>".
+# A process persists only its own rows, as a shard. Rows are keyed by user, so
+# when two workers fold the same user the duplicate is dropped at the next
+# `load`, which also compacts every shard into COMPACTED_FILE.
+_population: Dict[str, KLLSketch] = {}
+_seen: Set[str] = set()
+_local_rows: Dict[str, Dict[str, float]] = {}
+_lock = threading.Lock()
+_directory: Optional[str] = None
+_dirty = False
+_save_timer: Optional[threading.Timer] = None
+_save_timer_pid: Optional[int] = None
+_shard_name: Optional[str] = None
+_shard_pid: Optional[int] = None
+
+
+def configure(directory: Optional[str] = None) -> None:
+    global _directory
+    if directory is not None and _directory is None:
+        atexit.register(flush)
+    _directory = directory
+
+
+def load(directory: str) -> int:
+    """Load the population from `directory`, compacting it as it goes.
+
+    Reads COMPACTED_FILE and every shard, drops user-years that were already
+    counted, writes the result back as a single COMPACTED_FILE and deletes
+    the shards it read. Returns the number of shards merged.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _directory_lock(directory):
+        compacted = _read_json(os.path.join(directory, COMPACTED_FILE)) or {}
+        with _lock:
+            for key, data in compacted.get("sketches", {}).items():
+                _merge_sketch(key, KLLSketch.deserialize(data))
+            _seen.update(compacted.get("seen", []))
+
+        shard_paths = sorted(glob.glob(os.path.join(directory, SHARD_PATTERN)))
+        for path in shard_paths:
+            shard = _read_json(path) or {}
+            with _lock:
+                for seen_key, metrics in shard.get("rows", {}).items():
+                    _fold_metrics(seen_key, metrics)
+
+        if shard_paths:
+            with _lock:
+                compacted = {
+                    "sketches": {
+                        key: sketch.serialize() for key, sketch in _population.items()
+                    },
+                    "seen": sorted(_seen),
+                }
+            _write_json(os.path.join(directory, COMPACTED_FILE), compacted)
+            for path in shard_paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    return len(shard_paths)
+
+
+def fold_shelf(user_id: str, books: List[models.Book]) -> None:
+    """Add each year of `user_id`'s shelf to the population sketches.
+
+    A sketch can't forget a value, so a user's year is folded in only the
+    first time it is seen. The current year therefore reflects the shelf as
+    it was when that user was first fetched.
+    """
+    global _dirty
+    years = {book.date_read.year for book in books if book.date_read is not None}
+    with _lock:
+        for year in years:
+            seen_key = _seen_key(user_id, year)
+            if seen_key in _seen:
+                continue
+
+            metrics = year_metrics(books, year)
+            _fold_metrics(seen_key, metrics)
+            _local_rows[seen_key] = metrics
+            _dirty = True
+
+    if _dirty and _directory is not None:
+        _schedule_save()
+
+
+def percentile(year: int, metric: str, value: float) -> Optional[int]:
+    """Percentage of readers whose `metric` for `year` is below `value`."""
+    sketch = _population.get(_key(year, metric))
+    if sketch is None or sketch.n < MIN_POPULATION:
+        return None
+
+    return round(sketch.rank(value) * 100)
+
+
+def percentiles(year: int, books: List[models.Book]) -> Dict[str, int]:
+    found = {}
+    for metric, value in year_metrics(books, year).items():
+        result = percentile(year, metric, value)
+        if result is not None:
+            found[metric] = result
+
+    return found
+
+
+def year_metrics(books: List[models.Book], year: int) -> Dict[str, float]:
+    """The `BookData` metrics for `year`, leaving out any with no data behind it.
+
+    A year with no rated books has no average rating at all, rather than an
+    average of 0 that would drag everyone else's percentile down.
+    """
+    read_books = [
+        book
+        for book in books
+        if book.date_read is not None and book.date_read.year == int(year)
+    ]
+    num_pages = [book.num_pages for book in read_books if book.num_pages is not None]
+    # Goodreads reports an unrated book as 0, so only 1..5 are ratings.
+    ratings = [
+        book.rating
+        for book in read_books
+        if book.rating is not None and 1 <= book.rating <= 5
+    ]
+
+    metrics: Dict[str, float] = {
+        "count": len(read_books),
+        "total_pages": sum(num_pages),
+    }
+    if len(num_pages) > 0:
+        metrics["average_length"] = round(sum(num_pages) / len(num_pages))
+    if len(ratings) > 0:
+        metrics["average_rating"] = round(sum(ratings) / len(ratings))
+
+    return metrics
+
+
+def flush() -> None:
+    """Write this process's shard now if anything was folded since the last."""
+    global _dirty
+    if _directory is None:
+        return
+
+    with _lock:
+        if not _dirty:
+            return
+        shard = {"rows": dict(_local_rows)}
+        _dirty = False
+
+    # Under the lock, so a `load` can't read the old shard and then delete
+    # this write along with it.
+    try:
+        with _directory_lock(_directory):
+            _write_json(os.path.join(_directory, f"{_own_shard_name()}.json"), shard)
+    except OSError:
+        logger.exception("Failed to save population stats shard")
+
+
+def clear() -> None:
+    global _dirty
+    with _lock:
+        _population.clear()
+        _seen.clear()
+        _local_rows.clear()
+        _dirty = False
+
+
+# PRIVATE FUNCTIONS
+
+
+def _fold_metrics(seen_key: str, metrics: Dict[str, float]) -> None:
+    if seen_key in _seen:
+        return
+
+    year = int(seen_key.rsplit(":", 1)[1])
+    for metric, value in metrics.items():
+        key = _key(year, metric)
+        if key not in _population:
+            _population[key] = KLLSketch()
+        _population[key].update(value)
+    _seen.add(seen_key)
+
+
+def _merge_sketch(key: str, sketch: KLLSketch) -> None:
+    if key in _population:
+        _population[key].merge(sketch)
+    else:
+        _population[key] = sketch
+
+
+def _schedule_save() -> None:
+    global _save_timer, _save_timer_pid
+    with _lock:
+        # A timer started before a fork doesn't run in the child.
+        if (
+            _save_timer is not None
+            and _save_timer_pid == os.getpid()
+            and _save_timer.is_alive()
+        ):
+            return
+        _save_timer_pid = os.getpid()
+        _save_timer = threading.Timer(SAVE_DELAY_SECONDS, flush)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+
+def _own_shard_name() -> str:
+    # Named once per process, after any fork, so neither a forked worker nor a
+    # later process that happens to reuse a pid overwrites another's shard.
+    global _shard_name, _shard_pid
+    if _shard_name is None or _shard_pid != os.getpid():
+        _shard_pid = os.getpid()
+        _shard_name = (
+            f"shard-{socket.gethostname()}-{_shard_pid}-{uuid.uuid4().hex[:8]}"
+        )
+
+    return _shard_name
+
+
+@contextmanager
+def _directory_lock(directory: str):
+    # Held by `load` while it compacts and by `flush` while it writes a shard,
+    # so shards are never replaced between being read and being deleted.
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _seen_key(user_id: str, year: int) -> str:
+    return f"{user_id}:{year}"
+
+
+def _key(year: int, metric: str) -> str:
+    return f"{year}:{metric}"
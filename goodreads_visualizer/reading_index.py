@@ -0,0 +1,176 @@
+import bisect
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import List, Optional, Tuple
+
+from goodreads_visualizer import models
+
+
+@dataclass
+class RangeTotals:
+    count: int
+    total_pages: int
+    paged_count: int
+    rating_sum: int
+    rating_count: int
+
+
+class ReadingIndex:
+    """Per-day cumulative totals over a shelf's read books.
+
+    Built once per shelf. Every array is dense over the days between the first
+    and last read date, with a leading zero, so the total over days `a..b`
+    (as offsets from `first_day`) is `prefix[b + 1] - prefix[a]`.
+    """
+
+    def __init__(self, books: List[models.Book]):
+        self.books = sorted(
+            (book for book in books if book.date_read is not None),
+            key=lambda book: book.date_read,
+        )
+        self._days = [_as_date(book.date_read) for book in self.books]
+
+        if len(self.books) == 0:
+            self.first_day: Optional[date] = None
+            self.last_day: Optional[date] = None
+            self._books_prefix = [0]
+            self._pages_prefix = [0]
+            self._paged_count_prefix = [0]
+            self._rating_sum_prefix = [0]
+            self._rating_count_prefix = [0]
+            self._run_ending: List[int] = []
+            self._next_gap: List[int] = []
+            self._run_table: List[List[int]] = []
+            return
+
+        self.first_day = self._days[0]
+        self.last_day = self._days[-1]
+        num_days = (self.last_day - self.first_day).days + 1
+
+        books_per_day = [0] * num_days
+        pages_per_day = [0] * num_days
+        paged_count_per_day = [0] * num_days
+        rating_sum_per_day = [0] * num_days
+        rating_count_per_day = [0] * num_days
+        for book, day in zip(self.books, self._days):
+            offset = (day - self.first_day).days
+            books_per_day[offset] += 1
+            if book.num_pages is not None:
+                pages_per_day[offset] += book.num_pages
+                paged_count_per_day[offset] += 1
+            if book.rating is not None:
+                rating_sum_per_day[offset] += book.rating
+                rating_count_per_day[offset] += 1
+
+        self._books_prefix = [0, *accumulate(books_per_day)]
+        self._pages_prefix = [0, *accumulate(pages_per_day)]
+        self._paged_count_prefix = [0, *accumulate(paged_count_per_day)]
+        self._rating_sum_prefix = [0, *accumulate(rating_sum_per_day)]
+        self._rating_count_prefix = [0, *accumulate(rating_count_per_day)]
+
+        # Streaks: length of the run of reading days ending at each day, the
+        # first non-reading day at or after each day, and a sparse table for
+        # range maximum queries over the run lengths.
+        self._run_ending = []
+        run = 0
+        for count in books_per_day:
+            run = run + 1 if count > 0 else 0
+            self._run_ending.append(run)
+
+        self._next_gap = [num_days] * num_days
+        next_gap = num_days
+        for offset in range(num_days - 1, -1, -1):
+            if books_per_day[offset] == 0:
+                next_gap = offset
+            self._next_gap[offset] = next_gap
+
+        self._run_table = [self._run_ending]
+        width = 1
+        while width * 2 <= num_days:
+            previous = self._run_table[-1]
+            self._run_table.append(
+                [
+                    max(previous[i], previous[i + width])
+                    for i in range(num_days - width * 2 + 1)
+                ]
+            )
+            width *= 2
+
+    def totals(self, start: date, end: date) -> RangeTotals:
+        bounds = self._offsets(start, end)
+        if bounds is None:
+            return RangeTotals(
+                count=0, total_pages=0, paged_count=0, rating_sum=0, rating_count=0
+            )
+
+        a, b = bounds
+        return RangeTotals(
+            count=self._books_prefix[b + 1] - self._books_prefix[a],
+            total_pages=self._pages_prefix[b + 1] - self._pages_prefix[a],
+            paged_count=(self._paged_count_prefix[b + 1] - self._paged_count_prefix[a]),
+            rating_sum=self._rating_sum_prefix[b + 1] - self._rating_sum_prefix[a],
+            rating_count=(
+                self._rating_count_prefix[b + 1] - self._rating_count_prefix[a]
+            ),
+        )
+
+    def books_between(self, start: date, end: date) -> List[models.Book]:
+        lo = bisect.bisect_left(self._days, start)
+        hi = bisect.bisect_right(self._days, end)
+        return self.books[lo:hi]
+
+    def rolling_pages_per_day(
+        self, window_days: int, start: date, end: date
+    ) -> List[Tuple[date, float]]:
+        """Average pages per day over the trailing `window_days` for each day."""
+        pace = []
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            # Near `date.min` the window would start before the first
+            # representable day, which has nothing read anyway.
+            lookback = min(window_days - 1, (day - date.min).days)
+            totals = self.totals(day - timedelta(days=lookback), day)
+            pace.append((day, totals.total_pages / window_days))
+
+        return pace
+
+    def longest_streak(self, start: date, end: date) -> int:
+        """Most consecutive days within the range with at least one book read."""
+        bounds = self._offsets(start, end)
+        if bounds is None:
+            return 0
+
+        a, b = bounds
+        # The run containing `a` may have started before the range, so it is
+        # measured from `a`. Every later run starts inside the range and its
+        # length is exactly the run length recorded where it ends.
+        gap = min(self._next_gap[a], b + 1)
+        longest = gap - a
+        if gap <= b:
+            longest = max(longest, self._max_run_ending(gap, b))
+
+        return longest
+
+    def _offsets(self, start: date, end: date) -> Optional[Tuple[int, int]]:
+        if self.first_day is None or self.last_day is None:
+            return None
+
+        start = max(start, self.first_day)
+        end = min(end, self.last_day)
+        if start > end:
+            return None
+
+        return (start - self.first_day).days, (end - self.first_day).days
+
+    def _max_run_ending(self, a: int, b: int) -> int:
+        level = (b - a + 1).bit_length() - 1
+        row = self._run_table[level]
+        return max(row[a], row[b - (1 << level) + 1])
+
+
+def _as_date(value: date) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+
+    return value
@@ -0,0 +1,414 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from goodreads_visualizer import models, orchestrator
+
+FORMATS = ("arrow", "parquet")
+
+# Dates are naive UTC timestamps in milliseconds, the precision Goodreads
+# reports them in, so a shelf read back compares equal to the one written and
+# books read on the same day keep their order. Anything finer is truncated.
+BOOKS_SCHEMA = pa.schema(
+    [
+        pa.field("user_id", pa.string(), nullable=False),
+        pa.field("title", pa.string()),
+        pa.field("author", pa.string()),
+        pa.field("date_read", pa.timestamp("ms")),
+        pa.field("date_added", pa.timestamp("ms")),
+        pa.field("rating", pa.int8()),
+        pa.field("num_pages", pa.int32()),
+        pa.field("avg_rating", pa.float64()),
+        pa.field("date_published", pa.timestamp("ms")),
+        pa.field("isbn", pa.string()),
+    ]
+)
+
+AGGREGATES_SCHEMA = pa.schema(
+    [
+        pa.field("user_id", pa.string(), nullable=False),
+        pa.field("year", pa.int16(), nullable=False),
+        pa.field("count", pa.int32(), nullable=False),
+        pa.field("total_pages", pa.int64(), nullable=False),
+        pa.field("max_rating", pa.int8()),
+        pa.field("min_rating", pa.int8()),
+        pa.field("average_rating", pa.int8()),
+        pa.field("average_length", pa.int32()),
+        pa.field("max_length", pa.int32()),
+    ]
+)
+
+BOOK_COLUMNS = [name for name in BOOKS_SCHEMA.names if name != "user_id"]
+_LOW = np.iinfo(np.int64).min
+_HIGH = np.iinfo(np.int64).max
+
+
+@dataclass
+class ShelfTables:
+    books: pa.Table
+    aggregates: pa.Table
+
+
+@dataclass
+class YearStats:
+    """The `BookData` metrics for one year, with the books as rows of `read`."""
+
+    count: int
+    total_pages: int
+    average_rating: int
+    average_length: int
+    max_rating: Optional[int]
+    min_rating: Optional[int]
+    max_length: Optional[int]
+    max_rated_row: Optional[int]
+    min_rated_row: Optional[int]
+    longest_row: Optional[int]
+    shortest_row: Optional[int]
+
+
+_NO_STATS = YearStats(
+    count=0,
+    total_pages=0,
+    average_rating=0,
+    average_length=0,
+    max_rating=None,
+    min_rating=None,
+    max_length=None,
+    max_rated_row=None,
+    min_rated_row=None,
+    longest_row=None,
+    shortest_row=None,
+)
+
+
+@dataclass
+class ShelfYears:
+    """One user's read books, grouped by the year they were read.
+
+    `stats` and `month_counts` are keyed by year, with `None` for every
+    read book, like the `year` argument of the orchestrator.
+    """
+
+    read: pa.Table
+    by_year: Dict[int, pa.Table]
+    stats: Dict[Optional[int], YearStats]
+    month_counts: Dict[Optional[int], List[int]]
+
+
+def export_shelves(
+    shelves: Dict[str, List[models.Book]], directory: str, file_format: str = "arrow"
+) -> None:
+    """Write `shelves` and their per-year aggregates to `directory`.
+
+    Produces `books.<ext>` and `aggregates.<ext>`, where the extension is the
+    format: Arrow IPC (`arrow`) or Parquet (`parquet`).
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format: {file_format}")
+
+    os.makedirs(directory, exist_ok=True)
+    _write(books_table(shelves), _path(directory, "books", file_format), file_format)
+    _write(
+        aggregates_table(shelves),
+        _path(directory, "aggregates", file_format),
+        file_format,
+    )
+
+
+def load_shelves(directory: str) -> ShelfTables:
+    """Load tables written by `export_shelves`, memory mapping the files.
+
+    Arrow IPC columns point straight into the mapped file. Parquet has to be
+    decoded, so it is read through the map but lands in memory.
+    """
+    for file_format in FORMATS:
+        if os.path.exists(_path(directory, "books", file_format)):
+            return ShelfTables(
+                books=_read(_path(directory, "books", file_format), file_format),
+                aggregates=_read(
+                    _path(directory, "aggregates", file_format), file_format
+                ),
+            )
+
+    raise FileNotFoundError(f"No exported shelves in {directory}")
+
+
+def books_table(shelves: Dict[str, List[models.Book]]) -> pa.Table:
+    columns: Dict[str, list] = {name: [] for name in BOOKS_SCHEMA.names}
+    for user_id, books in shelves.items():
+        for book in books:
+            columns["user_id"].append(user_id)
+            columns["title"].append(book.title)
+            columns["author"].append(book.author)
+            columns["date_read"].append(book.date_read)
+            columns["date_added"].append(book.date_added)
+            columns["rating"].append(book.rating)
+            columns["num_pages"].append(book.num_pages)
+            columns["avg_rating"].append(book.avg_rating)
+            columns["date_published"].append(book.date_published)
+            columns["isbn"].append(book.isbn)
+
+    return pa.table(columns, schema=BOOKS_SCHEMA)
+
+
+def aggregates_table(shelves: Dict[str, List[models.Book]]) -> pa.Table:
+    columns: Dict[str, list] = {name: [] for name in AGGREGATES_SCHEMA.names}
+    for user_id, books in shelves.items():
+        years = {book.date_read.year for book in books if book.date_read is not None}
+        for year in sorted(years):
+            data = orchestrator.get_user_books_data(books, year)
+            columns["user_id"].append(user_id)
+            columns["year"].append(year)
+            columns["count"].append(data.count)
+            columns["total_pages"].append(int(data.total_pages.replace(",", "")))
+            columns["max_rating"].append(data.max_rating)
+            columns["min_rating"].append(data.min_rating)
+            columns["average_rating"].append(_optional_int(data.average_rating))
+            columns["average_length"].append(_optional_int(data.average_length))
+            columns["max_length"].append(data.max_length)
+
+    return pa.table(columns, schema=AGGREGATES_SCHEMA)
+
+
+def user_tables(table: pa.Table) -> Dict[str, pa.Table]:
+    """Split a books table into one zero-copy slice per user."""
+    if table.num_rows == 0:
+        return {}
+
+    encoded = pc.dictionary_encode(table["user_id"]).combine_chunks()
+    codes = encoded.indices.to_numpy()
+    starts = np.flatnonzero(np.diff(codes)) + 1
+    if len(starts) + 1 != len(encoded.dictionary):
+        # Rows are only grouped by user when written by `export_shelves`.
+        return user_tables(table.sort_by("user_id"))
+
+    bounds = [0, *starts.tolist(), table.num_rows]
+    return {
+        encoded.dictionary[codes[start]].as_py(): table.slice(start, end - start)
+        for start, end in zip(bounds, bounds[1:])
+    }
+
+
+def books_from_table(table: pa.Table) -> List[models.Book]:
+    return [_book(row) for row in table.to_pylist()]
+
+
+def shelf_years(table: pa.Table) -> ShelfYears:
+    """Group one user's read books by the year they were read.
+
+    Every year's metrics are computed here at once, with one reduction per
+    metric over the year-grouped columns, so the per-year calls below only
+    look them up. On a shelf's worth of rows that is much cheaper than a
+    round of compute calls for each year. Within a year books keep their
+    shelf order.
+    """
+    read = table.filter(pc.is_valid(table["date_read"]))
+    years = pc.year(read["date_read"]).to_numpy()
+    # Positions in `read`, grouped by year; stable, so ties keep shelf order.
+    rows = np.argsort(years, kind="stable")
+    grouped = read.take(rows)
+    grouped_years = years[rows]
+    months = pc.month(grouped["date_read"]).to_numpy()
+
+    starts = []
+    if len(rows) > 0:
+        starts = [0, *(np.flatnonzero(np.diff(grouped_years)) + 1).tolist()]
+    bounds = [*starts, len(rows)]
+    by_year = {}
+    month_counts: Dict[Optional[int], List[int]] = {None: _month_counts(months)}
+    for start, end in zip(starts, bounds[1:]):
+        year = int(grouped_years[start])
+        by_year[year] = grouped.slice(start, end - start)
+        month_counts[year] = _month_counts(months[start:end])
+
+    stats: Dict[Optional[int], YearStats] = {}
+    if len(rows) > 0:
+        stats = dict(zip(by_year, _group_stats(grouped, rows, starts)))
+        stats[None] = _group_stats(grouped, rows, [0])[0]
+
+    return ShelfYears(
+        read=read, by_year=by_year, stats=stats, month_counts=month_counts
+    )
+
+
+def book_data_from_years(years: ShelfYears, year: Optional[int]) -> models.BookData:
+    """`orchestrator.get_user_books_data` for one user, on the columns.
+
+    Only the few books the metrics point at are turned into `Book` objects,
+    so `list` is left empty; use `books_from_table` when it is needed.
+    """
+    stats = years.stats.get(None if year is None else int(year), _NO_STATS)
+
+    return models.BookData(
+        count=stats.count,
+        total_pages=f"{stats.total_pages:,}",
+        max_rated_book=_book_at(years.read, stats.max_rated_row),
+        min_rated_book=_book_at(years.read, stats.min_rated_row),
+        max_rating=stats.max_rating,
+        min_rating=stats.min_rating,
+        average_rating=str(stats.average_rating),
+        average_length=str(stats.average_length),
+        max_length=stats.max_length,
+        longest_book=_book_at(years.read, stats.longest_row),
+        shortest_book=_book_at(years.read, stats.shortest_row),
+        list=[],
+    )
+
+
+def graphs_data_from_years(
+    years: ShelfYears, year: Optional[int] = None
+) -> models.GraphsData:
+    """`orchestrator.graphs_data_for_year` for one user, on the columns."""
+    read = _year_rows(years, year)
+
+    previous_year_month_counts = None
+    if year is not None:
+        year = int(year)
+        previous_year_month_counts = years.month_counts.get(year - 1, [0] * 12)
+
+    return orchestrator.graphs_data_from_columns(
+        year=year,
+        month_counts=years.month_counts.get(year, [0] * 12),
+        previous_year_month_counts=previous_year_month_counts,
+        num_pages=read["num_pages"].drop_null().to_numpy(),
+        rating_counts=_counts(read["rating"].drop_null(), 5),
+        published_years=pc.year(read["date_published"].drop_null()).to_numpy(),
+    )
+
+
+# PRIVATE FUNCTIONS
+
+
+def _path(directory: str, name: str, file_format: str) -> str:
+    return os.path.join(directory, f"{name}.{file_format}")
+
+
+def _write(table: pa.Table, path: str, file_format: str) -> None:
+    if file_format == "parquet":
+        pq.write_table(table, path)
+        return
+
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read(path: str, file_format: str) -> pa.Table:
+    if file_format == "parquet":
+        return pq.read_table(path, memory_map=True)
+
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _year_rows(years: ShelfYears, year: Optional[int]) -> pa.Table:
+    if year is None:
+        return years.read
+
+    return years.by_year.get(int(year), years.read.slice(0, 0))
+
+
+def _group_stats(grouped: pa.Table, rows: np.ndarray, starts: List[int]):
+    """`YearStats` for each group of `grouped` starting at `starts`.
+
+    `rows` holds each grouped row's position in `read`. Ties are broken the
+    way the orchestrator's `max`/`min` break them, by taking the first book
+    in shelf order.
+    """
+    ratings, rated = _int_column(grouped["rating"])
+    pages, paged = _int_column(grouped["num_pages"])
+    dates = grouped["date_read"].to_numpy().astype(np.int64)
+
+    counts = np.diff([*starts, len(rows)])
+    group = np.repeat(np.arange(len(starts)), counts)
+    rating_counts = np.add.reduceat(rated.astype(np.int64), starts)
+    rating_sums = np.add.reduceat(np.where(rated, ratings, 0), starts)
+    page_counts = np.add.reduceat(paged.astype(np.int64), starts)
+    page_sums = np.add.reduceat(np.where(paged, pages, 0), starts)
+    max_ratings = np.maximum.reduceat(np.where(rated, ratings, _LOW), starts)
+    min_ratings = np.minimum.reduceat(np.where(rated, ratings, _HIGH), starts)
+    max_pages = np.maximum.reduceat(np.where(paged, pages, _LOW), starts)
+    min_pages = np.minimum.reduceat(np.where(paged, pages, _HIGH), starts)
+
+    def first_row(candidates):
+        return np.minimum.reduceat(np.where(candidates, rows, _HIGH), starts)
+
+    def latest_read_row(candidates):
+        latest = np.maximum.reduceat(np.where(candidates, dates, _LOW), starts)
+        return first_row(candidates & (dates == latest[group]))
+
+    max_rated_rows = latest_read_row(rated & (ratings == max_ratings[group]))
+    min_rated_rows = latest_read_row(rated & (ratings == min_ratings[group]))
+    longest_rows = first_row(paged & (pages == max_pages[group]))
+    shortest_rows = first_row(paged & (pages == min_pages[group]))
+
+    return [
+        YearStats(
+            count=int(counts[i]),
+            total_pages=int(page_sums[i]),
+            average_rating=_rounded_mean(rating_sums[i], rating_counts[i]),
+            average_length=_rounded_mean(page_sums[i], page_counts[i]),
+            max_rating=_optional(max_ratings[i]),
+            min_rating=_optional(min_ratings[i]),
+            max_length=_optional(max_pages[i]),
+            max_rated_row=_optional(max_rated_rows[i]),
+            min_rated_row=_optional(min_rated_rows[i]),
+            longest_row=_optional(longest_rows[i]),
+            shortest_row=_optional(shortest_rows[i]),
+        )
+        for i in range(len(starts))
+    ]
+
+
+def _int_column(column: pa.ChunkedArray):
+    valid = pc.is_valid(column).to_numpy(zero_copy_only=False)
+    values = pc.fill_null(column, 0).to_numpy().astype(np.int64)
+    return values, valid
+
+
+def _rounded_mean(total, count) -> int:
+    return round(int(total) / int(count)) if count > 0 else 0
+
+
+def _optional(value) -> Optional[int]:
+    # The sentinels stand in for "no such value" in the reductions above.
+    if value in (_LOW, _HIGH):
+        return None
+
+    return int(value)
+
+
+def _book_at(table: pa.Table, row: Optional[int]) -> Optional[models.Book]:
+    if row is None:
+        return None
+
+    # Reading one scalar per column is several times cheaper than converting
+    # a one-row slice with `to_pylist`.
+    return models.Book(**{name: table[name][row].as_py() for name in BOOK_COLUMNS})
+
+
+def _book(row: Dict) -> models.Book:
+    return models.Book(**{key: value for key, value in row.items() if key != "user_id"})
+
+
+def _month_counts(months: np.ndarray) -> List[int]:
+    counts = np.bincount(months, minlength=13)
+    return [int(count) for count in counts[1:13]]
+
+
+def _counts(values, size: int) -> List[int]:
+    """Occurrences of each of 1..`size` in an integer column."""
+    counts = np.bincount(values.to_numpy(), minlength=size + 1)
+    return [int(count) for count in counts[1 : size + 1]]
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+
+    return int(value)
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from goodreads_visualizer import models
+from goodreads_visualizer.reading_index import ReadingIndex
+
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_SNAPSHOT_SIZE = 100
+DEFAULT_MAX_SIZE = 1000
+
+
+@dataclass
+class CachedShelf:
+    books: List[models.Book]
+    fetched_at: float
+    hits: int = 0
+    index: Optional[ReadingIndex] = None
+
+
+# Least recently used first, so the oldest entry is evicted once the cache
+# holds more than `_max_size` shelves.
+_shelves: "OrderedDict[str, CachedShelf]" = OrderedDict()
+# Threaded workers share `_shelves`; every read-modify-write of it holds this.
+_lock = threading.Lock()
+_ttl_seconds = DEFAULT_TTL_SECONDS
+_max_size = DEFAULT_MAX_SIZE
+# Only set once this process has fetched something itself, so a process that
+# merely loaded the snapshot never writes it back.
+_dirty = False
+
+
+def configure(
+    ttl_seconds: int = DEFAULT_TTL_SECONDS, max_size: int = DEFAULT_MAX_SIZE
+) -> None:
+    global _ttl_seconds, _max_size
+    with _lock:
+        _ttl_seconds = ttl_seconds
+        _max_size = max_size
+        _evict()
+
+
+def get(user_id: str) -> Optional[List[models.Book]]:
+    with _lock:
+        entry = _shelves.get(user_id)
+        if entry is None:
+            return None
+
+        if _expired(entry):
+            del _shelves[user_id]
+            return None
+
+        _shelves.move_to_end(user_id)
+        entry.hits += 1
+        return entry.books
+
+
+def put(user_id: str, books: List[models.Book]) -> None:
+    global _dirty
+    with _lock:
+        previous = _shelves.get(user_id)
+        hits = previous.hits + 1 if previous is not None else 1
+        _shelves[user_id] = CachedShelf(books=books, fetched_at=time.time(), hits=hits)
+        _shelves.move_to_end(user_id)
+        _evict()
+        _dirty = True
+
+
+def reading_index(user_id: str, books: List[models.Book]) -> ReadingIndex:
+    """Index for `books`, built at most once per cached shelf."""
+    with _lock:
+        entry = _shelves.get(user_id)
+    if entry is None or entry.books is not books:
+        return ReadingIndex(books)
+
+    # Built outside the lock: a race only builds the same index twice.
+    if entry.index is None:
+        entry.index = ReadingIndex(books)
+    return entry.index
+
+
+def clear() -> None:
+    global _dirty
+    with _lock:
+        _shelves.clear()
+        _dirty = False
+
+
+def load_snapshot(path: str) -> int:
+    """Seed the cache from a snapshot written by `dump_snapshot`.
+
+    Shelves keep the time they were fetched, so anything older than the TTL
+    is skipped rather than served stale for another full TTL. Returns the
+    number of shelves loaded. A missing or unreadable snapshot is not an
+    error, the cache simply starts empty.
+    """
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return 0
+
+    shelves = {}
+    for user_id, entry in snapshot.get("users", {}).items():
+        shelf = CachedShelf(
+            books=[models.Book.deserialize(book) for book in entry["books"]],
+            fetched_at=entry.get("fetched_at", 0),
+            hits=entry.get("hits", 0),
+        )
+        if not _expired(shelf):
+            shelves[user_id] = shelf
+
+    with _lock:
+        _shelves.update(shelves)
+        _evict()
+    return len(shelves)
+
+
+def dump_snapshot(path: str, limit: int = DEFAULT_SNAPSHOT_SIZE) -> int:
+    """Write the `limit` most requested shelves to `path`.
+
+    Returns the number of shelves written, or 0 if nothing was fetched in this
+    process since the snapshot was loaded.
+    """
+    if not _dirty:
+        return 0
+
+    with _lock:
+        entries = list(_shelves.items())
+    hottest = sorted(entries, key=lambda item: item[1].hits, reverse=True)
+    snapshot = {
+        "users": {
+            user_id: {
+                "hits": entry.hits,
+                "fetched_at": entry.fetched_at,
+                "books": [book.serialize() for book in entry.books],
+            }
+            for user_id, entry in hottest[:limit]
+            if not _expired(entry)
+        }
+    }
+
+    # Write to a temporary file first so a worker exiting mid-write never
+    # leaves a truncated snapshot for the next boot.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+    return len(snapshot["users"])
+
+
+def _expired(entry: CachedShelf) -> bool:
+    return time.time() - entry.fetched_at > _ttl_seconds
+
+
+def _evict() -> None:
+    # Callers hold `_lock`.
+    while len(_shelves) > _max_size:
+        _shelves.popitem(last=False)
@@ -0,0 +1,92 @@
+import math
+import random
+from typing import Any, Dict, List, Optional
+
+DEFAULT_K = 200
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang & Liberty).
+
+    Items at level `h` each stand for `2 ** h` original values. When a level
+    outgrows its capacity it is sorted and every other item, from a random
+    offset, is promoted to the level above. Rank error is roughly `1.7 / k`.
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.levels: List[List[float]] = [[]]
+        self._random = random.Random(seed)
+
+    def update(self, value: float) -> None:
+        self.levels[0].append(value)
+        self.n += 1
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._compress()
+
+    def rank(self, value: float) -> float:
+        """Estimated fraction of values strictly less than `value`."""
+        if self.n == 0:
+            return 0.0
+
+        below = sum(
+            (1 << level) * sum(1 for item in items if item < value)
+            for level, items in enumerate(self.levels)
+        )
+        return min(below / self.n, 1.0)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+
+        weighted = sorted(
+            (item, 1 << level)
+            for level, items in enumerate(self.levels)
+            for item in items
+        )
+        target = q * self.n
+        seen = 0
+        for item, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return item
+        return weighted[-1][0]
+
+    def serialize(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "levels": self.levels}
+
+    @classmethod
+    def deserialize(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sketch = cls(k=data["k"])
+        sketch.n = data["n"]
+        sketch.levels = [list(items) for items in data["levels"]] or [[]]
+        return sketch
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(math.ceil(self.k * (2 / 3) ** depth), 2)
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+
+                items.sort()
+                # With an odd count the largest item stays behind so the
+                # promoted half stands for exactly twice as many values.
+                leftover = [items.pop()] if len(items) % 2 else []
+                offset = self._random.randint(0, 1)
+                self.levels[level + 1].extend(items[offset::2])
+                self.levels[level] = leftover
+            level += 1
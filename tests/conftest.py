@@ -0,0 +1,45 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from goodreads_visualizer import models
+
+
+def _random_shelf(rng, size, start=datetime(2019, 1, 1), span_days=1500):
+    books = []
+    for i in range(size):
+        date_read = None
+        if rng.random() < 0.85:
+            date_read = start + timedelta(
+                days=rng.randrange(span_days), minutes=rng.randrange(24 * 60)
+            )
+        books.append(
+            models.Book(
+                title=f"Book {i}",
+                author=f"Author {rng.randrange(20)}",
+                date_read=date_read,
+                date_added=start + timedelta(minutes=rng.randrange(24 * 60)),
+                rating=rng.choice([None, 0, 1, 2, 3, 4, 5]),
+                num_pages=rng.randrange(50, 900),
+                avg_rating=rng.choice([None, 3.87, 4.2]),
+                date_published=(
+                    datetime(rng.randrange(1850, 2020), rng.randrange(1, 13), 1)
+                    if rng.random() < 0.9
+                    else None
+                ),
+                isbn=f"{rng.randrange(10**13):013d}",
+            )
+        )
+
+    return books
+
+
+@pytest.fixture
+def random_shelf():
+    """Factory for reproducible random shelves with times of day on dates."""
+
+    def make(size=400, seed=0, **kwargs):
+        return _random_shelf(random.Random(seed), size, **kwargs)
+
+    return make
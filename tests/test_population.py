@@ -0,0 +1,189 @@
+import bisect
+import glob
+import json
+import os
+import random
+import threading
+from datetime import datetime
+
+import pytest
+
+from goodreads_visualizer import models, population
+from goodreads_visualizer.sketches import KLLSketch
+
+# Comfortably above the ~1.7 / k expected for k=200, and well below what a
+# broken compaction or merge produces.
+MAX_RANK_ERROR = 0.025
+
+
+def _book(year, rating=4, num_pages=300):
+    return models.Book(
+        title="Book",
+        author="Author",
+        date_read=datetime(year, 6, 1, 21, 15),
+        date_added=datetime(year, 1, 1),
+        rating=rating,
+        num_pages=num_pages,
+        avg_rating=4.1,
+        date_published=datetime(2001, 1, 1),
+        isbn="9780000000000",
+    )
+
+
+@pytest.fixture(autouse=True)
+def clean_population():
+    population.clear()
+    population.configure()
+    yield
+    population.clear()
+    population.configure()
+
+
+def _values(distribution, size, rng):
+    if distribution == "lognormal":
+        return [rng.lognormvariate(6, 1) for _ in range(size)]
+    if distribution == "uniform":
+        return [rng.uniform(0, 1000) for _ in range(size)]
+    return [rng.randrange(1, 6) for _ in range(size)]
+
+
+def _max_rank_error(sketch, values):
+    exact = sorted(values)
+    probes = sorted(set(exact[:: max(len(exact) // 200, 1)] + [exact[-1] + 1]))
+    return max(
+        abs(sketch.rank(probe) - bisect.bisect_left(exact, probe) / len(exact))
+        for probe in probes
+    )
+
+
+@pytest.mark.parametrize("distribution", ["lognormal", "uniform", "integer"])
+def test_rank_is_close_after_merge_and_round_trip(distribution):
+    rng = random.Random(7)
+    values = _values(distribution, 40_000, rng)
+
+    shards = [KLLSketch(seed=seed) for seed in range(4)]
+    for i, value in enumerate(values):
+        shards[i % 4].update(value)
+    merged = KLLSketch(seed=10)
+    for shard in shards:
+        merged.merge(KLLSketch.deserialize(json.loads(json.dumps(shard.serialize()))))
+    restored = KLLSketch.deserialize(json.loads(json.dumps(merged.serialize())))
+
+    assert restored.n == len(values)
+    assert _max_rank_error(merged, values) <= MAX_RANK_ERROR
+    assert _max_rank_error(restored, values) <= MAX_RANK_ERROR
+
+
+def test_small_sketch_is_exact():
+    values = list(range(100))
+    sketch = KLLSketch(seed=0)
+    for value in values:
+        sketch.update(value)
+
+    assert _max_rank_error(sketch, values) == 0
+
+
+def test_fold_shelf_counts_a_user_once():
+    books = [_book(2022), _book(2022), _book(2023)]
+
+    population.fold_shelf("1", books)
+    population.fold_shelf("1", books + [_book(2022)])
+
+    assert population._population["2022:count"].n == 1
+    assert population._population["2022:count"].quantile(0.5) == 2
+    assert population._population["2023:count"].n == 1
+
+
+def test_year_metrics_skips_metrics_without_data():
+    unrated = [_book(2022, rating=0), _book(2022, rating=None)]
+    metrics = population.year_metrics(unrated, 2022)
+
+    assert metrics["count"] == 2
+    assert "average_rating" not in metrics
+
+    population.fold_shelf("1", unrated)
+    assert "2022:average_rating" not in population._population
+
+    metrics = population.year_metrics([_book(2022, rating=0), _book(2022)], 2022)
+    assert metrics["average_rating"] == 4
+
+
+def test_percentiles_need_a_minimum_population():
+    for user_id in range(population.MIN_POPULATION - 1):
+        population.fold_shelf(str(user_id), [_book(2022)] * (user_id + 1))
+    assert population.percentiles(2022, [_book(2022)] * 5) == {}
+
+    population.fold_shelf("last", [_book(2022)] * population.MIN_POPULATION)
+    found = population.percentiles(2022, [_book(2022)] * 5)
+    assert found["count"] == 40
+    assert "average_rating" in found
+
+
+def test_load_merges_shards_and_compacts(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    monkeypatch.setattr(population, "_schedule_save", lambda: None)
+
+    # Two workers each fold a user of their own, and both fold user "shared".
+    population.configure(directory)
+    population.fold_shelf("a", [_book(2022)])
+    population.fold_shelf("shared", [_book(2022), _book(2022)])
+    population.flush()
+    population.clear()
+    population._shard_name = None
+    population.fold_shelf("b", [_book(2022)] * 3)
+    population.fold_shelf("shared", [_book(2022), _book(2022)])
+    population.flush()
+    assert len(glob.glob(os.path.join(directory, population.SHARD_PATTERN))) == 2
+
+    population.clear()
+    assert population.load(directory) == 2
+
+    assert population._population["2022:count"].n == 3
+    assert glob.glob(os.path.join(directory, population.SHARD_PATTERN)) == []
+    assert os.path.exists(os.path.join(directory, population.COMPACTED_FILE))
+
+    # The compacted file alone gives the same population, and a user already
+    # in it isn't counted again when a later shard repeats them.
+    population.clear()
+    population.fold_shelf("shared", [_book(2022), _book(2022)])
+    population.fold_shelf("c", [_book(2022)] * 4)
+    population.flush()
+    population.clear()
+    assert population.load(directory) == 1
+    assert population._population["2022:count"].n == 4
+
+    population.clear()
+    assert population.load(directory) == 0
+    assert population._population["2022:count"].n == 4
+
+
+def test_fetch_survives_a_failing_fold(monkeypatch):
+    from goodreads_visualizer import goodreads_api, shelf_cache
+
+    def fail(user_id, books):
+        raise TypeError("bad shelf")
+
+    books = [_book(2022)]
+    monkeypatch.setattr(goodreads_api, "_fetch_books_data", lambda user_id: books)
+    monkeypatch.setattr(population, "fold_shelf", fail)
+    shelf_cache.clear()
+
+    assert goodreads_api.fetch_books_data("1") is books
+    shelf_cache.clear()
+
+
+def test_flush_waits_for_a_load_in_progress(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    monkeypatch.setattr(population, "_schedule_save", lambda: None)
+    population.configure(directory)
+    population.fold_shelf("a", [_book(2022)])
+
+    with population._directory_lock(directory):
+        writer = threading.Thread(target=population.flush)
+        writer.start()
+        writer.join(0.2)
+        assert writer.is_alive()
+        assert glob.glob(os.path.join(directory, population.SHARD_PATTERN)) == []
+
+    writer.join()
+    assert len(glob.glob(os.path.join(directory, population.SHARD_PATTERN))) == 1
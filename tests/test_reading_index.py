@@ -0,0 +1,196 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from goodreads_visualizer import create_app, orchestrator, shelf_cache
+from goodreads_visualizer.reading_index import ReadingIndex
+
+USER_ID = "123456789"
+
+
+def _read_between(books, start, end):
+    return [
+        book
+        for book in books
+        if book.date_read is not None and start <= book.date_read.date() <= end
+    ]
+
+
+def _longest_streak(books, start, end):
+    days = {book.date_read.date() for book in _read_between(books, start, end)}
+    longest = current = 0
+    day = start
+    while day <= end:
+        current = current + 1 if day in days else 0
+        longest = max(longest, current)
+        day += timedelta(days=1)
+    return longest
+
+
+def _random_ranges(count, seed=1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        start = date(2018, 6, 1) + timedelta(days=rng.randrange(1900))
+        yield start, start + timedelta(days=rng.randrange(700))
+
+
+@pytest.fixture
+def books(random_shelf):
+    return random_shelf()
+
+
+@pytest.fixture
+def index(books):
+    return ReadingIndex(books)
+
+
+def test_totals_match_brute_force(books, index):
+    for start, end in _random_ranges(500):
+        selected = _read_between(books, start, end)
+        totals = index.totals(start, end)
+
+        assert totals.count == len(selected)
+        assert totals.total_pages == sum(book.num_pages for book in selected)
+        assert totals.paged_count == len(selected)
+        rated = [book.rating for book in selected if book.rating is not None]
+        assert totals.rating_sum == sum(rated)
+        assert totals.rating_count == len(rated)
+
+
+def test_books_between_matches_brute_force(books, index):
+    for start, end in _random_ranges(500):
+        expected = _read_between(books, start, end)
+
+        assert sorted(map(id, index.books_between(start, end))) == sorted(
+            map(id, expected)
+        )
+
+
+def test_longest_streak_matches_brute_force(books, index):
+    for start, end in _random_ranges(500):
+        assert index.longest_streak(start, end) == _longest_streak(books, start, end)
+
+
+def test_longest_streak_on_dense_shelf(random_shelf):
+    books = random_shelf(size=600, span_days=200)
+    index = ReadingIndex(books)
+
+    for start, end in _random_ranges(300, seed=2):
+        assert index.longest_streak(start, end) == _longest_streak(books, start, end)
+
+
+def test_book_data_for_range_matches_orchestrator(books, index):
+    for start, end in _random_ranges(300):
+        selected = _read_between(books, start, end)
+        if not selected:
+            continue
+
+        expected = orchestrator.get_user_books_data(selected, None)
+        actual = orchestrator.get_user_books_data_for_range(index, start, end)
+
+        assert actual.serialize() == expected.serialize()
+
+
+def test_rolling_pages_per_day_matches_brute_force(books, index):
+    start, end = date(2020, 1, 1), date(2020, 3, 31)
+    for day, pace in index.rolling_pages_per_day(30, start, end):
+        window = _read_between(books, day - timedelta(days=29), day)
+        assert pace == sum(book.num_pages for book in window) / 30
+
+
+def test_rolling_pages_per_day_near_date_min(index):
+    pace = index.rolling_pages_per_day(30, date.min, date.min + timedelta(days=2))
+
+    assert [pages for _, pages in pace] == [0, 0, 0]
+
+
+def test_empty_shelf():
+    index = ReadingIndex([])
+
+    assert index.totals(date(2020, 1, 1), date(2020, 12, 31)).count == 0
+    assert index.books_between(date(2020, 1, 1), date(2020, 12, 31)) == []
+    assert index.longest_streak(date(2020, 1, 1), date(2020, 12, 31)) == 0
+
+
+@pytest.fixture
+def client(books):
+    shelf_cache.clear()
+    app = create_app()
+    shelf_cache.put(USER_ID, books)
+    yield app.test_client()
+    shelf_cache.clear()
+
+
+def test_range_endpoint_with_months(client, books):
+    response = client.get(f"/users/{USER_ID}/range?start=2020-06&end=2021-03")
+
+    assert response.status_code == 200
+    stats = response.json["stats"]
+    assert stats["start"] == "2020-06-01"
+    assert stats["end"] == "2021-03-31"
+    assert stats["count"] == len(
+        _read_between(books, date(2020, 6, 1), date(2021, 3, 31))
+    )
+    assert len(response.json["rolling_pages_per_day"]["labels"]) == 304
+
+
+def test_range_endpoint_with_last_days(client):
+    response = client.get(f"/users/{USER_ID}/range?last_days=90")
+
+    assert response.status_code == 200
+    stats = response.json["stats"]
+    assert date.fromisoformat(stats["end"]) == date.today()
+    assert date.fromisoformat(stats["start"]) == date.today() - timedelta(days=89)
+
+
+def test_range_endpoint_clamps_series_to_shelf(client):
+    response = client.get(f"/users/{USER_ID}/range?start=0001-01&end=9999-12")
+
+    assert response.status_code == 200
+    assert len(response.json["rolling_pages_per_day"]["labels"]) <= 1500
+
+    shelf_cache.put("empty", [])
+    response = client.get("/users/empty/range?start=0001-01&end=9999-12")
+
+    assert response.status_code == 200
+    assert response.json["stats"]["count"] == 0
+    assert response.json["rolling_pages_per_day"] is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "start=bad",
+        "start=2021-01&end=2020-01",
+        "last_days=0",
+        "last_days=100000000",
+        "window=0",
+        "window=100000000",
+        "window=abc",
+    ],
+)
+def test_range_endpoint_rejects_bad_params(client, query):
+    assert client.get(f"/users/{USER_ID}/range?{query}").status_code == 400
+
+
+def test_user_page_with_range(client):
+    response = client.get(f"/users/{USER_ID}?start=2020-06&end=2021-03")
+
+    assert response.status_code == 200
+    assert "Jun 01, 2020 – Mar 31, 2021" in response.text
+    assert client.get(f"/users/{USER_ID}?last_days=100000000").status_code == 400
+
+
+def test_rating_distribution_skips_unrated_books(random_shelf):
+    books = random_shelf(seed=5)
+    year = 2020
+
+    graphs = orchestrator.graphs_data_for_year(books, year)
+
+    expected = [0] * 5
+    for book in books:
+        if book.date_read is not None and book.date_read.year == year:
+            if book.rating in (1, 2, 3, 4, 5):
+                expected[book.rating - 1] += 1
+    assert graphs.book_rating_distribution.datasets[0].data == expected
@@ -0,0 +1,135 @@
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from goodreads_visualizer import models, orchestrator, shelf_arrow  # noqa: E402
+
+
+@pytest.fixture
+def shelves(random_shelf):
+    return {
+        str(user_id): random_shelf(size=120, seed=user_id, span_days=900)
+        for user_id in range(5)
+    }
+
+
+def _years(books):
+    return sorted({book.date_read.year for book in books if book.date_read})
+
+
+@pytest.mark.parametrize("file_format", shelf_arrow.FORMATS)
+def test_export_and_load_round_trip(shelves, tmp_path, file_format):
+    shelf_arrow.export_shelves(shelves, str(tmp_path), file_format)
+    tables = shelf_arrow.load_shelves(str(tmp_path))
+
+    assert tables.books.schema == shelf_arrow.BOOKS_SCHEMA
+    assert tables.aggregates.equals(shelf_arrow.aggregates_table(shelves))
+
+    by_user = shelf_arrow.user_tables(tables.books)
+    assert list(by_user) == list(shelves)
+    for user_id, books in shelves.items():
+        assert shelf_arrow.books_from_table(by_user[user_id]) == books
+
+
+def test_load_without_export_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        shelf_arrow.load_shelves(str(tmp_path))
+
+
+def test_export_rejects_unknown_format(shelves, tmp_path):
+    with pytest.raises(ValueError):
+        shelf_arrow.export_shelves(shelves, str(tmp_path), "csv")
+
+
+def test_user_tables_on_unsorted_table(shelves):
+    # Interleave users so their rows are no longer grouped.
+    tables = [
+        shelf_arrow.books_table({user_id: [book]})
+        for user_id, books in shelves.items()
+        for book in books
+    ]
+    tables.sort(key=lambda table: table["title"][0].as_py())
+    table = pa.concat_tables(tables)
+
+    by_user = shelf_arrow.user_tables(table)
+
+    assert sorted(by_user) == sorted(shelves)
+    for user_id, books in shelves.items():
+        expected = sorted(books, key=lambda book: book.title)
+        assert shelf_arrow.books_from_table(by_user[user_id]) == expected
+
+
+def test_user_tables_on_empty_table():
+    assert shelf_arrow.user_tables(shelf_arrow.books_table({})) == {}
+
+
+def test_columnar_data_matches_orchestrator(shelves):
+    by_user = shelf_arrow.user_tables(shelf_arrow.books_table(shelves))
+
+    for user_id, books in shelves.items():
+        years = shelf_arrow.shelf_years(by_user[user_id])
+        # The app hands the orchestrator read books only; the table has every
+        # book and the columnar path does that filtering itself.
+        read_books = [book for book in books if book.date_read is not None]
+        for year in [None, *_years(books)]:
+            expected = orchestrator.get_user_books_data(books, year)
+            assert shelf_arrow.book_data_from_years(years, year) == dataclasses.replace(
+                expected, list=[]
+            )
+
+            assert shelf_arrow.graphs_data_from_years(
+                years, year
+            ) == orchestrator.graphs_data_for_year(read_books, year)
+
+
+def test_ties_on_the_same_day_keep_shelf_order():
+    def book(title, hour, rating):
+        return models.Book(
+            title=title,
+            author="Author",
+            date_read=datetime(2023, 5, 1, hour, 30),
+            date_added=datetime(2023, 1, 1, 9),
+            rating=rating,
+            num_pages=100 + hour * 10,
+            avg_rating=4.1,
+            date_published=datetime(1990 + hour, 1, 1),
+            isbn="9780000000000",
+        )
+
+    books = [
+        book("Morning", 8, 5),
+        book("Evening", 20, 5),
+        book("Also evening", 20, 5),
+        book("Low", 6, 1),
+        book("Later low", 23, 1),
+        book("Unrated", 12, None),
+    ]
+    years = shelf_arrow.shelf_years(shelf_arrow.books_table({"1": books}))
+
+    data = shelf_arrow.book_data_from_years(years, 2023)
+
+    assert data.max_rated_book.title == "Evening"
+    assert data.min_rated_book.title == "Later low"
+    assert data == dataclasses.replace(
+        orchestrator.get_user_books_data(books, 2023), list=[]
+    )
+    graphs = shelf_arrow.graphs_data_from_years(years, 2023)
+    assert graphs.book_rating_distribution.datasets[0].data == [2, 0, 0, 0, 3]
+
+
+def test_shelf_with_nothing_read(random_shelf):
+    books = [
+        dataclasses.replace(book, date_read=None)
+        for book in random_shelf(size=10, seed=3)
+    ]
+    years = shelf_arrow.shelf_years(shelf_arrow.books_table({"1": books}))
+
+    for year in [None, 2020]:
+        assert shelf_arrow.book_data_from_years(
+            years, year
+        ) == orchestrator.get_user_books_data(books, year)
+        month_counts = shelf_arrow.graphs_data_from_years(years, year).books_read
+        assert month_counts.datasets[0].data == [0] * 12
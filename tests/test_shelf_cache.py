@@ -0,0 +1,138 @@
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from goodreads_visualizer import models, shelf_cache
+
+
+def _book(title):
+    return models.Book(
+        title=title,
+        author="Author",
+        date_read=datetime(2023, 5, 1, 18, 30),
+        date_added=datetime(2023, 1, 1),
+        rating=4,
+        num_pages=300,
+        avg_rating=4.1,
+        date_published=datetime(2001, 1, 1),
+        isbn="9780000000000",
+    )
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    shelf_cache.clear()
+    shelf_cache.configure()
+    yield
+    shelf_cache.clear()
+    shelf_cache.configure()
+
+
+def test_get_returns_put_shelf():
+    books = [_book("A")]
+    shelf_cache.put("1", books)
+
+    assert shelf_cache.get("1") is books
+    assert shelf_cache.get("2") is None
+
+
+def test_expired_shelf_is_dropped(monkeypatch):
+    shelf_cache.configure(ttl_seconds=10)
+    shelf_cache.put("1", [_book("A")])
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+
+    assert shelf_cache.get("1") is None
+
+
+def test_least_recently_used_shelf_is_evicted():
+    shelf_cache.configure(max_size=2)
+    shelf_cache.put("1", [_book("A")])
+    shelf_cache.put("2", [_book("B")])
+    shelf_cache.get("1")
+    shelf_cache.put("3", [_book("C")])
+
+    assert shelf_cache.get("1") is not None
+    assert shelf_cache.get("2") is None
+    assert shelf_cache.get("3") is not None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    shelf_cache.put("1", [_book("A"), _book("B")])
+    assert shelf_cache.dump_snapshot(path) == 1
+
+    shelf_cache.clear()
+    assert shelf_cache.load_snapshot(path) == 1
+    assert [book.title for book in shelf_cache.get("1")] == ["A", "B"]
+    assert shelf_cache.get("1")[0].date_read == datetime(2023, 5, 1, 18, 30)
+
+
+def test_snapshot_respects_ttl_on_load(tmp_path):
+    path = tmp_path / "snapshot.json"
+    book = _book("A").serialize()
+    path.write_text(
+        json.dumps(
+            {
+                "users": {
+                    "fresh": {"hits": 1, "fetched_at": time.time(), "books": [book]},
+                    "stale": {
+                        "hits": 9,
+                        "fetched_at": time.time() - 2 * 60 * 60,
+                        "books": [book],
+                    },
+                }
+            }
+        )
+    )
+
+    assert shelf_cache.load_snapshot(str(path)) == 1
+    assert shelf_cache.get("fresh") is not None
+    assert shelf_cache.get("stale") is None
+
+
+def test_unchanged_snapshot_is_not_written_back(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    shelf_cache.put("1", [_book("A")])
+    shelf_cache.dump_snapshot(path)
+    shelf_cache.clear()
+    shelf_cache.load_snapshot(path)
+
+    assert shelf_cache.dump_snapshot(path) == 0
+
+
+def test_concurrent_get_and_put(monkeypatch):
+    # Every shelf is expired, so each `get` deletes what a `put` just added.
+    monkeypatch.setattr(shelf_cache, "_expired", lambda entry: True)
+    shelf_cache.configure(max_size=4)
+    books = [_book("A")]
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(5000):
+                user_id = str((i + offset) % 8)
+                shelf_cache.put(user_id, books)
+                shelf_cache.get(user_id)
+        except Exception as error:
+            errors.append(error)
+
+    # Switch threads as often as possible so unguarded updates would collide.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert len(shelf_cache._shelves) <= 4
@@ -1,5 +1,6 @@
-from goodreads_visualizer import app
+from goodreads_visualizer import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run()
-